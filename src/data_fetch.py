@@ -1,15 +1,72 @@
 from pathlib import Path
-import json
+from email.utils import parsedate_to_datetime
+import asyncio
+import logging
+import math
+import random
+import re
+import threading
 import time
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Mapping, Optional, Union
 
+import aiohttp
+import orjson
 import requests
+import requests_cache
+from requests.adapters import HTTPAdapter
 
 # Paths & constants
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = PROJECT_ROOT / "data"
 RESULTS_DIR = PROJECT_ROOT / "results"
 DEFAULT_TIMEOUT = 15
+RETRY_BACKOFF_CAP = 30.0  # seconds
+RATE_LIMIT_LOW_WATER = 2  # pause once remaining quota drops to this
+DEFAULT_MAX_CONCURRENCY = 8  # parallel requests per host for batched fetches
+HTTP_CACHE_PATH = DATA_DIR / ".http_cache"
+HTTP_CACHE_EXPIRE = 300  # seconds; chain metrics change roughly once per block
+VOLATILE_METRICS = {"unconfirmedcount"}  # never served from the cache
+# Sent on every outbound request (requests and aiohttp) so JSON comes back compressed.
+DEFAULT_HEADERS = {"Connection": "keep-alive", "Accept-Encoding": "gzip, deflate"}
+
+logger = logging.getLogger(__name__)
+
+# Shared HTTP session (keep-alive across calls, GET responses cached on disk)
+_SESSION: Optional[requests_cache.CachedSession] = None
+_SESSION_LOCK = threading.Lock()
+
+
+def _get_session() -> requests_cache.CachedSession:
+    """Return the module-wide session, creating it on first use (thread-safe)."""
+    global _SESSION
+    if _SESSION is not None:
+        return _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is not None:
+            return _SESSION
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        session = requests_cache.CachedSession(
+            str(HTTP_CACHE_PATH),
+            backend="sqlite",
+            expire_after=HTTP_CACHE_EXPIRE,
+            allowable_methods=["GET"],
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(DEFAULT_HEADERS)
+        _SESSION = session
+        return session
+
+
+def close_session() -> None:
+    """Close the shared session (e.g. at the end of tests)."""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is not None:
+            _SESSION.close()
+            _SESSION = None
+
 
 # Small helpers
 def ensure_dirs() -> None:
@@ -18,9 +75,108 @@ def ensure_dirs() -> None:
 
 
 def write_json(obj: Any, out_path: Path) -> None:
+    """Write obj as indented UTF-8 JSON (NumPy scalars/arrays allowed).
+
+    Non-finite floats (NaN, inf) are written as null, and ints must fit in 64 bits.
+    """
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    with out_path.open("w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
+    options = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    out_path.write_bytes(orjson.dumps(obj, option=options))
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        return max(0.0, seconds) if math.isfinite(seconds) else None
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _retry_delay(
+    status: Optional[int],
+    headers: Mapping[str, str],
+    attempt: int,
+    backoff_seconds: float,
+) -> float:
+    """Seconds to wait before retrying a failed request."""
+    if status in (429, 503):
+        retry_after = _parse_retry_after(headers.get("Retry-After"))
+        if retry_after is not None:
+            return min(RETRY_BACKOFF_CAP, retry_after)
+        return backoff_seconds * attempt
+    if status is not None and status >= 500:
+        delay = min(RETRY_BACKOFF_CAP, backoff_seconds * 2**attempt)
+        return delay + random.uniform(0, 0.3 * backoff_seconds)
+    return backoff_seconds * attempt
+
+
+def _is_retryable(status: int) -> bool:
+    """Only rate limiting and server errors are worth retrying."""
+    return status == 429 or status >= 500
+
+
+def _rate_limit_pause(headers: Mapping[str, str]) -> float:
+    """Seconds to pause when the server reports (almost) no remaining quota."""
+    try:
+        remaining = int(headers.get("x-ratelimit-remaining", "999"))
+    except ValueError:
+        return 0.0
+    if remaining > RATE_LIMIT_LOW_WATER:
+        return 0.0
+    try:
+        reset = float(headers.get("x-ratelimit-reset", "0"))
+    except ValueError:
+        return 0.0
+    # Some APIs send an epoch timestamp, others a delay in seconds.
+    if reset > 1e9:
+        reset -= time.time()
+    return min(RETRY_BACKOFF_CAP, max(0.0, reset))
+
+
+def _get_with_retries(
+    url: str,
+    params: Optional[Dict[str, Any]],
+    headers: Optional[Dict[str, str]],
+    timeout: int,
+    max_retries: int,
+    backoff_seconds: float,
+    expire_after: Optional[int] = None,
+) -> requests.Response:
+    """GET on the shared session, retrying rate limits, server and network errors."""
+    cache_kwargs = {} if expire_after is None else {"expire_after": expire_after}
+    for attempt in range(1, max_retries + 1):
+        try:
+            r = _get_session().get(url, params=params, headers=headers, timeout=timeout, **cache_kwargs)
+            r.raise_for_status()
+        except requests.HTTPError as e:
+            status = e.response.status_code
+            if attempt >= max_retries or not _is_retryable(status):
+                raise
+            time.sleep(_retry_delay(status, e.response.headers, attempt, backoff_seconds))
+        except requests.RequestException:
+            if attempt >= max_retries:
+                raise
+            time.sleep(_retry_delay(None, {}, attempt, backoff_seconds))
+        else:
+            logger.debug(
+                "GET %s -> %s (Content-Encoding: %s)",
+                r.url, r.status_code, r.headers.get("Content-Encoding", "identity"),
+            )
+            # Cached responses carry stale rate-limit headers and cost no quota.
+            pause = 0.0 if getattr(r, "from_cache", False) else _rate_limit_pause(r.headers)
+            if pause:
+                time.sleep(pause)
+            return r
+    raise ValueError("max_retries must be >= 1")
 
 
 def http_get_text(
@@ -30,22 +186,14 @@ def http_get_text(
     timeout: int = DEFAULT_TIMEOUT,
     max_retries: int = 3,
     backoff_seconds: float = 1.5,
+    expire_after: Optional[int] = None,
 ) -> str:
-    """GET text with simple retries/backoff."""
-    last = None
-    for attempt in range(1, max_retries + 1):
-        try:
-            r = requests.get(url, params=params, headers=headers, timeout=timeout)
-            r.raise_for_status()
-            return r.text
-        except Exception as e:
-            last = e
-            if attempt < max_retries:
-                time.sleep(backoff_seconds * attempt)
-            else:
-                raise
-    assert last
-    raise last
+    """GET text with retries/backoff (honors Retry-After and rate-limit headers).
+
+    expire_after overrides the cache lifetime for this request (0 disables caching).
+    """
+    r = _get_with_retries(url, params, headers, timeout, max_retries, backoff_seconds, expire_after)
+    return r.text
 
 
 def http_get_json(
@@ -56,28 +204,58 @@ def http_get_json(
     max_retries: int = 3,
     backoff_seconds: float = 1.5,
 ) -> Union[Dict[str, Any], list]:
-    """GET JSON with simple retries/backoff."""
-    last = None
+    """GET JSON with retries/backoff (honors Retry-After and rate-limit headers)."""
+    r = _get_with_retries(url, params, headers, timeout, max_retries, backoff_seconds)
+    return orjson.loads(r.content)
+
+
+async def _afetch(
+    session: aiohttp.ClientSession,
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: int = DEFAULT_TIMEOUT,
+    max_retries: int = 3,
+    backoff_seconds: float = 1.5,
+) -> str:
+    """Async GET text with the same retries/backoff as http_get_text."""
     for attempt in range(1, max_retries + 1):
         try:
-            r = requests.get(url, params=params, headers=headers, timeout=timeout)
-            r.raise_for_status()
-            return r.json()
-        except Exception as e:
-            last = e
-            if attempt < max_retries:
-                time.sleep(backoff_seconds * attempt)
-            else:
+            async with session.get(
+                url, params=params, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as r:
+                r.raise_for_status()
+                text = await r.text()
+                pause = _rate_limit_pause(r.headers)
+        except aiohttp.ClientResponseError as e:
+            if attempt >= max_retries or not _is_retryable(e.status):
+                raise
+            await asyncio.sleep(_retry_delay(e.status, e.headers or {}, attempt, backoff_seconds))
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt >= max_retries:
                 raise
-    assert last
-    raise last
+            await asyncio.sleep(_retry_delay(None, {}, attempt, backoff_seconds))
+        else:
+            if pause:
+                await asyncio.sleep(pause)
+            return text
+    raise ValueError("max_retries must be >= 1")
 
 # Blockchain.com Query API
+_FLOAT_RE = re.compile(r"-?\d+\.\d+([eE][-+]?\d+)?")
+
+
 def _coerce_number(s: str) -> Union[int, float, str]:
     """Try to parse numeric string to int/float. Return original if not numeric."""
+    s = s.strip()
+    if (s[1:] if s.startswith("-") else s).isdecimal():
+        return int(s)
+    if _FLOAT_RE.fullmatch(s):
+        return float(s)
+    # Rare formats (e.g. "1.", "+5") still go through the exception path.
     try:
         return float(s) if "." in s else int(s)
-    except Exception:
+    except ValueError:
         return s
 
 
@@ -85,10 +263,14 @@ def fetch_blockchain_metric(
     metric: str,
     base_url: str = "https://blockchain.info/q",
     timeout: int = DEFAULT_TIMEOUT,
+    refresh: bool = False,
 ) -> Union[int, float, str]:
     """
     Fetch a metric from Blockchain.com's Query API.
 
+    Responses are cached for HTTP_CACHE_EXPIRE seconds (except VOLATILE_METRICS);
+    pass refresh=True to drop the cached value and query the API again.
+
     Examples (doctest):
         >>> val = fetch_blockchain_metric("getdifficulty")  # doctest: +ELLIPSIS
         >>> isinstance(val, (int, float)) and val > 0
@@ -98,9 +280,60 @@ def fetch_blockchain_metric(
         True
     """
     url = f"{base_url}/{metric}"
-    text = http_get_text(url, timeout=timeout)
+    if refresh:
+        _get_session().cache.delete(urls=[url])
+    expire_after = 0 if metric in VOLATILE_METRICS else None
+    text = http_get_text(url, timeout=timeout, expire_after=expire_after)
+    return _coerce_number(text.strip())
+
+
+async def afetch_blockchain_metric(
+    session: aiohttp.ClientSession,
+    metric: str,
+    base_url: str = "https://blockchain.info/q",
+    timeout: int = DEFAULT_TIMEOUT,
+) -> Union[int, float, str]:
+    """Async variant of fetch_blockchain_metric on a caller-owned aiohttp session."""
+    url = f"{base_url}/{metric}"
+    text = await _afetch(session, url, timeout=timeout)
     return _coerce_number(text.strip())
 
+
+async def afetch_many_metrics(
+    metrics: List[str],
+    base_url: str = "https://blockchain.info/q",
+    timeout: int = DEFAULT_TIMEOUT,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> Dict[str, Union[int, float, str]]:
+    """Fetch several Query API metrics concurrently, at most max_concurrency in flight."""
+    sem = asyncio.Semaphore(max_concurrency)
+    connector = aiohttp.TCPConnector(limit_per_host=max_concurrency)
+    async with aiohttp.ClientSession(connector=connector, headers=DEFAULT_HEADERS) as s:
+
+        async def one(metric: str) -> Union[int, float, str]:
+            async with sem:
+                return await afetch_blockchain_metric(s, metric, base_url=base_url, timeout=timeout)
+
+        values = await asyncio.gather(*(one(m) for m in metrics))
+    return dict(zip(metrics, values))
+
+
+def fetch_many_metrics(
+    metrics: List[str],
+    base_url: str = "https://blockchain.info/q",
+    timeout: int = DEFAULT_TIMEOUT,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> Dict[str, Union[int, float, str]]:
+    """
+    Fetch several metrics from Blockchain.com's Query API concurrently.
+
+    Examples (doctest):
+        >>> vals = fetch_many_metrics(["getdifficulty", "getblockcount"])  # doctest: +ELLIPSIS
+        >>> sorted(vals) == ["getblockcount", "getdifficulty"] and vals["getblockcount"] > 0
+        True
+    """
+    return asyncio.run(afetch_many_metrics(metrics, base_url, timeout, max_concurrency))
+
 # CoinGecko (simple/price)
 def fetch_coingecko_simple_price(
     ids: str = "bitcoin",
@@ -121,26 +354,58 @@ def fetch_coingecko_simple_price(
     return http_get_json(url, params=params, timeout=timeout, max_retries=max_retries)
 
 
+async def afetch_coingecko_simple_price(
+    session: aiohttp.ClientSession,
+    ids: str = "bitcoin",
+    vs_currencies: str = "usd",
+    timeout: int = DEFAULT_TIMEOUT,
+    max_retries: int = 3,
+) -> Dict[str, Any]:
+    """Async variant of fetch_coingecko_simple_price on a caller-owned aiohttp session."""
+    url = "https://api.coingecko.com/api/v3/simple/price"
+    params = {"ids": ids, "vs_currencies": vs_currencies}
+    text = await _afetch(session, url, params=params, timeout=timeout, max_retries=max_retries)
+    return orjson.loads(text)
+
+
 # Demo
-def _demo() -> None:
+async def _ademo() -> None:
     ensure_dirs()
 
+    connector = aiohttp.TCPConnector(limit_per_host=8)
+    async with aiohttp.ClientSession(connector=connector, headers=DEFAULT_HEADERS) as s:
+        # Both hosts are queried concurrently; failures are reported per source.
+        blockchain, coingecko = await asyncio.gather(
+            asyncio.gather(
+                afetch_blockchain_metric(s, "getdifficulty"),
+                afetch_blockchain_metric(s, "getblockcount"),
+                afetch_blockchain_metric(s, "unconfirmedcount"),
+            ),
+            afetch_coingecko_simple_price(s, ids="bitcoin", vs_currencies="usd"),
+            return_exceptions=True,
+        )
+
     # 1) Blockchain.com
-    try:
-        diff = fetch_blockchain_metric("getdifficulty")
-        height = fetch_blockchain_metric("getblockcount")
-        write_json({"difficulty": diff, "height": height}, DATA_DIR / ".sample_blockchain_q.json")
+    if isinstance(blockchain, Exception):
+        print("Blockchain.com Query API FAILED ->", blockchain)
+    else:
+        diff, height, unconf = blockchain
+        write_json(
+            {"difficulty": diff, "height": height, "unconfirmed": unconf},
+            DATA_DIR / ".sample_blockchain_q.json",
+        )
         print("Blockchain.com Query API OK")
-    except Exception as e:
-        print("Blockchain.com Query API FAILED ->", e)
 
     # 2) CoinGecko
-    try:
-        sp = fetch_coingecko_simple_price(ids="bitcoin", vs_currencies="usd")
-        write_json(sp, DATA_DIR / ".sample_coingecko_simple_price.json")
+    if isinstance(coingecko, Exception):
+        print("CoinGecko API FAILED ->", coingecko)
+    else:
+        write_json(coingecko, DATA_DIR / ".sample_coingecko_simple_price.json")
         print("CoinGecko API OK")
-    except Exception as e:
-        print("CoinGecko API FAILED ->", e)
+
+
+def _demo() -> None:
+    asyncio.run(_ademo())
 
 
 if __name__ == "__main__":
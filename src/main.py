@@ -1,7 +1,12 @@
 from pathlib import Path
-import json
+from typing import Optional
+import hashlib
 import numpy as np
+import orjson
 import pandas as pd
+import matplotlib
+
+matplotlib.use("Agg")  # headless: figures are only saved to disk
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import xgboost as xgb
@@ -16,35 +21,49 @@ start_date = pd.to_datetime("2023-01-01")
 
 # Reading JSON data
 json_path = DATA_DIR / "pools-timeseries.json"
-with open(json_path, "r", encoding="utf-8") as f:
-    data = json.load(f)
+data = orjson.loads(json_path.read_bytes())
 pools_ts = data["pools-timeseries"]
 market_price = data["market-price"]
 
 # Constructing the mining pool DataFrame & HHI
-records = []
+# Flat parallel columns; dates are parsed in one vectorized call.
+dates, pool_names, blocks = [], [], []
 for date_str, pools in pools_ts.items():
-    date = pd.to_datetime(date_str).tz_localize(None)
-    for pool_name, blocks in pools.items():
-        records.append({"date": date, "pool": pool_name, "blocks": blocks})
-pools_df = pd.DataFrame(records)
+    dates.extend([date_str] * len(pools))
+    pool_names.extend(pools.keys())
+    blocks.extend(pools.values())
+pools_df = pd.DataFrame({
+    "date": pd.to_datetime(dates).tz_localize(None),
+    "pool": pool_names,
+    "blocks": np.asarray(blocks, dtype=np.int32),
+})
 pools_df = pools_df[pools_df["date"] >= start_date]
 
 # Main mining pools
 major_pools = ["Unknown", "AntPool", "ViaBTC", "F2Pool", "Mara Pool", "SBI Crypto"]
 
-pivot = pools_df.pivot_table(
-    index="date", columns="pool", values="blocks", fill_value=0
+pool_order = major_pools + ["Others"]
+
+# Group other mining pools together as "Others" before pivoting,
+# so the wide frame only ever has len(pool_order) columns; pools absent
+# from the window (e.g. no minor pools at all) still get an all-zero column.
+pool_labels = pools_df["pool"].where(pools_df["pool"].isin(major_pools), "Others")
+pools_df = pools_df.assign(pool=pd.Categorical(pool_labels, categories=pool_order))
+distribution_df = (
+    pools_df.groupby(["date", "pool"], observed=True)["blocks"]
+    .sum()
+    .unstack(fill_value=0)
+    .reindex(columns=pool_order, fill_value=0)
 )
 
-# Group other mining pools together as "Others".
-other_cols = [c for c in pivot.columns if c not in major_pools]
-pivot["Others"] = pivot[other_cols].sum(axis=1)
-distribution_df = pivot[major_pools + ["Others"]]
-
 # Calculate HHI
-shares = distribution_df.div(distribution_df.sum(axis=1), axis=0)
-hhi_series = (shares**2).sum(axis=1)
+# HHI = sum(share_i^2) = sum(blocks_i^2) / total^2, fused in one pass over the array.
+blocks_arr = distribution_df.to_numpy(dtype=np.float64)
+totals = blocks_arr.sum(axis=1)
+hhi_series = pd.Series(
+    np.einsum("ij,ij->i", blocks_arr, blocks_arr) / totals**2,
+    index=distribution_df.index,
+)
 hhi_daily = hhi_series.resample("D").mean().ffill()
 
 # Constructing a price series
@@ -73,17 +92,19 @@ colors = [
     "pink",  # Others
 ]
 
-bottom = pd.Series(0, index=distribution_df.index)
-for pool, color in zip(distribution_df.columns, colors):
+# Bar bottoms for every pool in one cumulative sum over the columns.
+vals = distribution_df.to_numpy()
+bottoms = np.zeros_like(vals)
+bottoms[:, 1:] = np.cumsum(vals[:, :-1], axis=1)
+for i, (pool, color) in enumerate(zip(distribution_df.columns, colors)):
     ax1.bar(
         distribution_df.index,
-        distribution_df[pool],
-        bottom=bottom,
+        vals[:, i],
+        bottom=bottoms[:, i],
         label=pool,
         color=color,
         width=1.0,
     )
-    bottom += distribution_df[pool]
 
 ax1.set_title(
     f"Mining Pool Blocks Distribution ({start_date.date()} to {distribution_df.index.max().date()})"
@@ -122,37 +143,65 @@ fig3.savefig(RESULTS_DIR / "market_price.png")
 
 # =================================================
 # XGBoost time series forecasting (for HHI & Price)
+def date_features(index: pd.DatetimeIndex) -> np.ndarray:
+    """Calendar features (month, dayofyear, dayofweek) per date, shape (len(index), 3)."""
+    return np.stack(
+        [index.month.values, index.dayofyear.values, index.dayofweek.values], axis=1
+    )
+
+
 def create_features(series: pd.Series) -> pd.DataFrame:
     """Given a daily time series, generate lagged features and date features."""
     df = pd.DataFrame({"target": series})
     df["lag1"] = series.shift(1)
     df["lag7"] = series.shift(7)
     df["lag30"] = series.shift(30)
-    df["month"] = series.index.month
-    df["dayofyear"] = series.index.dayofyear
-    df["dayofweek"] = series.index.dayofweek
+    df[["month", "dayofyear", "dayofweek"]] = date_features(series.index)
     return df
 
 
-def train_xgb_model(series: pd.Series) -> xgb.Booster:
-    """Use XGBoost to fit the given time series."""
-    feat_df = create_features(series).dropna()
-    X = feat_df[["lag1", "lag7", "lag30", "month", "dayofyear", "dayofweek"]].values
-    y = feat_df["target"].values
-
-    dtrain = xgb.DMatrix(X, label=y)
-
+def train_xgb_model(series: pd.Series, name: Optional[str] = None) -> xgb.Booster:
+    """
+    Use XGBoost to fit the given time series.
+    If name is given, the model is saved to RESULTS_DIR/{name}_{key}.json and reused
+    as long as the series (values and dates) and training parameters are unchanged.
+    """
     params = {
         "objective": "reg:squarederror",
+        "tree_method": "hist",
         "eta": 0.05,
         "max_depth": 4,
         "subsample": 0.8,
         "colsample_bytree": 0.8,
         "seed": 42,
     }
-
     num_boost_round = 300
+
+    model_path = None
+    if name is not None:
+        digest = hashlib.sha256(series.to_numpy(dtype=np.float64).tobytes())
+        digest.update(series.index.asi8.tobytes())
+        digest.update(repr((sorted(params.items()), num_boost_round)).encode())
+        model_path = RESULTS_DIR / f"{name}_{digest.hexdigest()[:16]}.json"
+        if model_path.exists():
+            model = xgb.Booster()
+            model.load_model(model_path)
+            return model
+
+    feat_df = create_features(series).dropna()
+    # XGBoost works in float32 internally; converting here avoids its own copy.
+    X = feat_df[["lag1", "lag7", "lag30", "month", "dayofyear", "dayofweek"]].to_numpy(dtype=np.float32)
+    y = feat_df["target"].to_numpy(dtype=np.float32)
+
+    # QuantileDMatrix builds the histogram cuts directly (requires tree_method="hist").
+    dtrain = xgb.QuantileDMatrix(X, label=y)
     model = xgb.train(params, dtrain, num_boost_round=num_boost_round)
+
+    if model_path is not None:
+        # Drop models trained on older data before saving the current one.
+        for stale in RESULTS_DIR.glob(f"{name}_*.json"):
+            stale.unlink()
+        model.save_model(model_path)
     return model
 
 
@@ -161,37 +210,49 @@ def forecast_with_xgb(series: pd.Series, model: xgb.Booster, end_date: pd.Timest
     Use the trained XGBoost model to make recursive predictions up to the end_date.
     Return: The complete sequence including historical data and predictions (with the same index).
     """
-    forecast_series = series.copy()
-    last_date = forecast_series.index[-1]
+    last_date = series.index[-1]
     forecast_days = (end_date - last_date).days
     if forecast_days <= 0:
-        return forecast_series
-
-    for i in range(forecast_days):
-        next_date = last_date + timedelta(days=i + 1)
-
-        lag1 = forecast_series.iloc[-1]
-        lag7 = forecast_series.iloc[-7] if len(forecast_series) >= 7 else lag1
-        lag30 = forecast_series.iloc[-30] if len(forecast_series) >= 30 else lag1
-
-        month = next_date.month
-        dayofyear = next_date.dayofyear
-        dayofweek = next_date.dayofweek
+        return series.copy()
+
+    # Calendar features for the whole span are computed once and sliced per step.
+    future_dates = pd.date_range(last_date + timedelta(days=1), end_date, freq="D")
+    full_index = series.index.append(future_dates)
+    date_feat = date_features(full_index).astype(np.float32)
+
+    # History followed by the forecast horizon, filled in place.
+    n_hist = len(series)
+    buf = np.empty(n_hist + forecast_days, dtype=np.float64)
+    buf[:n_hist] = series.to_numpy(dtype=np.float64)
+
+    # Buffer positions of lag1/lag7/lag30 for every step (short histories fall back to lag1),
+    # so the loop body is plain array reads with no per-step branching.
+    steps = np.arange(n_hist, n_hist + forecast_days)
+    lag_idx = np.stack(
+        [
+            steps - 1,
+            np.where(steps >= 7, steps - 7, steps - 1),
+            np.where(steps >= 30, steps - 30, steps - 1),
+        ],
+        axis=1,
+    )
 
-        features = np.array([[lag1, lag7, lag30, month, dayofyear, dayofweek]])
-        dtest = xgb.DMatrix(features)
-        pred = float(model.predict(dtest)[0])
+    # Reused every step; inplace_predict reads NumPy directly without a DMatrix.
+    features = np.empty((1, 6), dtype=np.float32)
+    for t, idx in zip(steps, lag_idx):
+        features[0, :3] = buf[idx]
+        features[0, 3:] = date_feat[t]
 
-        forecast_series.loc[next_date] = pred
+        buf[t] = model.inplace_predict(features)[0]
 
-    return forecast_series
+    return pd.Series(buf, index=full_index, name=series.name)
 
 forecast_end = pd.to_datetime("2026-12-31")
 
 
 # ---------------
 # 4. HHI forecast
-hhi_model = train_xgb_model(hhi_daily)
+hhi_model = train_xgb_model(hhi_daily, name="hhi")
 hhi_full = forecast_with_xgb(hhi_daily, hhi_model, forecast_end)
 hhi_forecast_only = hhi_full[hhi_daily.index[-1] + timedelta(days=1):]
 
@@ -216,7 +277,7 @@ fig4.savefig(RESULTS_DIR / "hhi_forecast.png")
 
 # -------------------
 # 5. Price prediction
-price_model = train_xgb_model(price_daily)
+price_model = train_xgb_model(price_daily, name="price")
 price_full = forecast_with_xgb(price_daily, price_model, forecast_end)
 price_forecast_only = price_full[price_daily.index[-1] + timedelta(days=1):]
 
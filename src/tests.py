@@ -1,5 +1,6 @@
-import time
+from concurrent.futures import ThreadPoolExecutor
 from src.data_fetch import (
+    close_session,
     ensure_dirs,
     write_json,
     fetch_blockchain_metric,
@@ -31,7 +32,10 @@ def test_coingecko_simple_price():
     print(f"CoinGecko simple/price test: OK -> {out.name}")
 
 if __name__ == "__main__":
-    test_blockchain_query_api()
-    time.sleep(2)
-    test_coingecko_simple_price()
+    # Different hosts with independent rate limits, so the two tests can run side by side.
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        futures = [ex.submit(test_blockchain_query_api), ex.submit(test_coingecko_simple_price)]
+        for f in futures:
+            f.result()
+    close_session()
     print("All tests ran successfully.")